@@ -1,9 +1,17 @@
 from mcts_node import MCTSNode
 from p2_t3 import Board
-from random import choice
+from random import seed, getrandbits
 from math import sqrt, log
+from time import monotonic
+from multiprocessing import Pool
+import numpy as np
+import fast_rollout
+from concurrent.futures import ThreadPoolExecutor
 
 num_nodes = 100
+num_workers = 4
+num_threads = 4
+batch_size = 8
 explore_faction = 2.
 
 def traverse_nodes(node: MCTSNode, board: Board, state, bot_identity: int):
@@ -25,34 +33,43 @@ def traverse_nodes(node: MCTSNode, board: Board, state, bot_identity: int):
     currentNode = node
     newState = state
 
-    # If the current node has untried actions and the game did not end
-    if len(currentNode.untried_actions) < 1 and not board.is_ended(newState):
+    # Descend iteratively: the tree can reach ~81 plies, and an explicit loop
+    # avoids the per-call overhead (and recursion limit) of the old tail recursion.
+    while True:
+        # Mark this node as having a simulation in flight so concurrent
+        # selections are steered toward different paths.
+        with currentNode.lock:
+            currentNode.virtual_losses += 1
+            if currentNode.parent is not None:
+                currentNode.parent.child_virtual_losses[currentNode.index_in_parent] = currentNode.virtual_losses
 
-        bestUCB = -999999
-        bestNode = None
-        bestAction = None
+        # Stop on an expandable or terminal node
+        if len(currentNode.untried_actions) > 0 or board.is_ended(newState):
+            return currentNode, newState
 
-        # Iterate over all child nodes
-        for child in currentNode.child_nodes.keys():
-            # If the current node is not visited or has an untried action
-            if currentNode.child_nodes[child].visits == 0 or len(currentNode.untried_actions) > 0:
-                return currentNode.child_nodes[child], board.next_state(state, child)
+        # Snapshot the expanded-child count, as other threads may attach concurrently
+        numChildren = len(currentNode.child_actions)
 
-            childUCB = ucb(currentNode.child_nodes[child], bot_identity == board.current_player(state))
+        # A concurrent expansion may not have attached its child yet
+        if numChildren == 0:
+            return currentNode, newState
 
-            # Update the current best node and ucb
-            if childUCB > bestUCB:
-                bestUCB = childUCB
-                bestAction = child
-                bestNode = currentNode.child_nodes[child]
+        # All siblings share the same parent, so take the log once instead of per child
+        logParentVisits = log(currentNode.visits + currentNode.virtual_losses)
 
-        # Set the current best node as the starting point for the next round of the loop
-        currentNode = bestNode
-        newState = board.next_state(state, bestAction)
-        # Recursively continue the search
-        return traverse_nodes(currentNode, board, newState, bot_identity)
+        # Whose turn it is is fixed for all children of this node, so resolve the
+        # perspective to a specialized scoring function once instead of branching inside it
+        ucbFunction = _ucb_opp if bot_identity == board.current_player(newState) else _ucb_self
 
-    return currentNode, newState
+        # Score every child at once over the parent's contiguous stat columns
+        ucbValues = ucbFunction(currentNode, numChildren, logParentVisits)
+        best = int(ucbValues.argmax())
+
+        # Descend into the best child and keep going; positional indexing avoids
+        # hashing the 4-tuple action key
+        bestAction = currentNode.child_actions[best]
+        currentNode = currentNode.children[best]
+        newState = board.next_state(newState, bestAction)
 
 def expand_leaf(node: MCTSNode, board: Board, state):
     """ Adds a new leaf to the tree by creating a new child node for the given node (if it is non-terminal).
@@ -67,86 +84,55 @@ def expand_leaf(node: MCTSNode, board: Board, state):
         state: The state associated with that node
 
     """
-    # pass
     # expand only if child nodes have been visited
-    if len(node.untried_actions) > 0:
-        # parent transititions state
-        parentAction = node.untried_actions.pop()
-        # new state
-        nextState = board.next_state(state, parentAction)
-        # list of actions for new node
-        actionList = board.legal_actions(nextState)
-
-        # new node
-        newNode = MCTSNode(node, parentAction, actionList)
-        node.child_nodes[parentAction] = newNode
-
-    
-        return newNode, nextState
-    
-    return node, state
+    with node.lock:
+        if len(node.untried_actions) > 0:
+            # parent transititions state
+            parentAction = node.untried_actions.pop()
+        else:
+            return node, state
+
+    # new state
+    nextState = board.next_state(state, parentAction)
+    # list of actions for new node
+    actionList = board.legal_actions(nextState)
+
+    # new node
+    newNode = MCTSNode(node, parentAction, actionList)
+    # the new leaf joins the in-flight path, so it carries a virtual loss too
+    newNode.virtual_losses = 1
+
+    # attach under the lock so the child gets a stable slot in the parent's stat arrays;
+    # children goes first so any slot visible through child_actions has a node behind it
+    with node.lock:
+        newNode.index_in_parent = len(node.child_actions)
+        node.child_virtual_losses[newNode.index_in_parent] = 1
+        node.children.append(newNode)
+        node.child_actions.append(parentAction)
+
+    return newNode, nextState
 
 def rollout(board: Board, state):
-    """ Given the state of the game, the rollout plays out the remainder randomly.
+    """ Given the state of the game, the rollout plays out the remainder with the heuristic
+    policy. The playout itself runs in the compiled fast_rollout kernel on a flat board,
+    which keeps the dominant per-move work out of the interpreter.
 
     Args:
         board:  The game setup.
         state:  The state of the game.
-    
+
     Returns:
-        state: The terminal game state
+        The point values of the terminal game state, keyed by player.
 
     """
-    # vanilla rollout for experiment #1
-    # while not board.is_ended(state):
-    #     # do random
-    #     randomAction = choice(board.legal_actions(state))
-    #     # update state
-    #     state = board.next_state(state, randomAction)
-    
-    # return state
-
-    while not board.is_ended(state):
-        nextAction = None
-        validActions = []
-        for action in board.legal_actions(state):
-            nextState = board.next_state(state, action)
-            nextStateScore = board.points_values(nextState)
-            currPlayer = board.current_player(state)
-
-            # if next action will end game 
-            if nextStateScore != None:
-                # choose action that will win the game
-                if nextStateScore[currPlayer] == 1:
-                    nextAction = action
-                    break
-            
-                # avoid actions that will lose the game
-                elif nextStateScore[currPlayer] == -1:
-                    continue
-
-            R, C, r, c = action
-            nextStateBoxes = board.owned_boxes(nextState)
-
-            # if next action will gain board for self, choose it
-            if nextStateBoxes[(R, C)] == currPlayer:
-                nextAction = action
-                break
-
-            # if next action will gain board for enemy, avoid it
-            if nextStateBoxes[(R, C)] == 3 - currPlayer: # 2 if currPlayer == 1; 1 if currPlayer == 2
-                continue
-
-            # if neither good nor bad, add to valid actions
-            validActions.append(action)
-
-        # pick randomly from valid actions
-        if nextAction == None:
-            nextAction = choice(validActions)
-        
-        state = board.next_state(state, nextAction)
-
-    return state
+    boards, macro, constraint, player = fast_rollout.pack_state(state)
+    winner = fast_rollout.simulate(boards, macro, constraint, player)
+
+    if winner == 1:
+        return {1: 1, 2: -1}
+    elif winner == 2:
+        return {1: -1, 2: 1}
+    return {1: 0, 2: 0}
 
 def backpropagate(node: MCTSNode|None, won: bool):
     """ Navigates the tree from a leaf node to the root, updating the win and visit count of each node along the path.
@@ -156,33 +142,110 @@ def backpropagate(node: MCTSNode|None, won: bool):
         won:    An indicator of whether the bot won or lost the game.
 
     """
-    # pass
-    node.wins += won
-    node.visits += 1
-    if not node.parent:
-        return None
+    # walk the parent pointers iteratively; no need for a call frame per ply
+    while node is not None:
+        with node.lock:
+            node.wins += won
+            node.visits += 1
+            # the simulation is done, so lift the virtual loss placed on the way down
+            node.virtual_losses -= 1
+
+            # mirror the new totals into the parent's stat columns for vectorized
+            # selection, and refresh the derived accumulators here - once per
+            # backpropagation - so selection never has to divide or sqrt for this child
+            parent = node.parent
+            if parent is not None:
+                i = node.index_in_parent
+                parent.child_wins[i] = node.wins
+                parent.child_visits[i] = node.visits
+                parent.child_virtual_losses[i] = node.virtual_losses
+                parent.child_q[i] = node.wins / node.visits
+                parent.child_inv_sqrt_visits[i] = 1.0 / sqrt(node.visits)
+        node = node.parent
+
+def _ucb_opp(node: MCTSNode, n: int, log_parent_visits: float):
+    """ Calculates the UCB values for a whole sibling set at once, for nodes where the
+    last action was performed by the MCTS bot. Operates on the parent's
+    structure-of-arrays stat columns so the arithmetic runs in NumPy rather than
+    per-child Python bytecode. The win rate and 1/sqrt(visits) come from the
+    accumulators backpropagation maintains, so the common case needs no division;
+    only children with simulations in flight get the exact virtual-loss-adjusted
+    form recomputed.
+
+    Args:
+        node:              The parent node whose children are being scored.
+        n:                 How many children are currently attached.
+        log_parent_visits: log of the parent's visit count, computed once per selection step
+                           since it is shared by all siblings
+
+    Returns:
+        An array of UCB values, one per child. Children that have never been
+        visited (or touched by a concurrent thread) score +inf so they are
+        selected first.
+    """
+    visits = node.child_visits[:n]
+    vloss = node.child_virtual_losses[:n]
+    q = node.child_q[:n]
+    explore = sqrt(log_parent_visits) * node.child_inv_sqrt_visits[:n]
+
+    hot = vloss > 0
+    if hot.any():
+        # in-flight simulations count as losses from the maximizing perspective,
+        # which pushes concurrent threads onto different siblings
+        totalVisits = visits + vloss
+        with np.errstate(divide='ignore', invalid='ignore'):
+            q = np.where(hot, (node.child_wins[:n] - vloss) / totalVisits, q)
+            explore = np.where(hot, np.sqrt(log_parent_visits / totalVisits), explore)
+        unvisited = totalVisits == 0
     else:
-        return backpropagate(node.parent, won)
+        unvisited = visits == 0
+
+    ucb_values = q + explore_faction * explore
 
-def ucb(node: MCTSNode, is_opponent: bool):
-    """ Calculates the UCB value for the given node from the perspective of the bot
+    # unvisited, untouched children get +inf so argmax takes them first
+    ucb_values[unvisited] = np.inf
+
+    return ucb_values
+
+def _ucb_self(node: MCTSNode, n: int, log_parent_visits: float):
+    """ Calculates the UCB values for a whole sibling set at once, for nodes where the
+    last action was performed by the opponent (so the cached win rates are inverted).
 
     Args:
-        node:        A node.
-        is_opponent: A boolean indicating whether or not the last action was performed by the MCTS bot
+        node:              The parent node whose children are being scored.
+        n:                 How many children are currently attached.
+        log_parent_visits: log of the parent's visit count, computed once per selection step
+                           since it is shared by all siblings
 
     Returns:
-        The value of the UCB function for the given node
+        An array of UCB values, one per child, with never-visited children at +inf.
     """
-    if is_opponent:
-        ucb_value = node.wins / node.visits + explore_faction * (sqrt(log(node.parent.visits) / node.visits))
+    visits = node.child_visits[:n]
+    vloss = node.child_virtual_losses[:n]
+    exploit = 1 - node.child_q[:n]
+    explore = sqrt(log_parent_visits) * node.child_inv_sqrt_visits[:n]
+
+    hot = vloss > 0
+    if hot.any():
+        totalVisits = visits + vloss
+        with np.errstate(divide='ignore', invalid='ignore'):
+            exploit = np.where(hot, 1 - (node.child_wins[:n] + vloss) / totalVisits, exploit)
+            explore = np.where(hot, np.sqrt(log_parent_visits / totalVisits), explore)
+        unvisited = totalVisits == 0
     else:
-        ucb_value = (1 - node.wins / node.visits) + explore_faction * (sqrt(log(node.parent.visits) / node.visits))
+        unvisited = visits == 0
+
+    ucb_values = exploit + explore_faction * explore
 
-    return ucb_value
+    ucb_values[unvisited] = np.inf
+
+    return ucb_values
 
 def get_best_action(root_node: MCTSNode):
-    """ Selects the best action from the root node in the MCTS tree
+    """ Selects the best action from the root node in the MCTS tree, using the
+    robust-child rule: the most-visited child. Raw win rate is noisy on
+    low-visit children, whereas the search only accumulates visits on moves
+    that keep winning the selection contest.
 
     Args:
         root_node:   The root node
@@ -191,58 +254,114 @@ def get_best_action(root_node: MCTSNode):
         action: The best action from the root node
 
     """
-    action = None
-    bestRate = -999999
+    numChildren = len(root_node.child_actions)
+    if numChildren == 0:
+        return None
 
-    for child in root_node.child_nodes.values(): 
-        currRate = child.wins / child.visits
+    return root_node.child_actions[int(root_node.child_visits[:numChildren].argmax())]
 
-        if currRate > bestRate:
-            bestRate = currRate
-            action = child.parent_action  
+def _build_tree(args):
+    """ Builds one MCTS tree and harvests the statistics of the root's children.
+    Runs inside a worker process for root parallelization. Within the worker the
+    iterations run in batches: each cycle selects and expands batch_size leaves (the
+    virtual losses placed during traversal steer the selections apart), rolls them all
+    out on the thread pool, then backpropagates the whole batch. This amortizes the
+    Python traversal overhead over several rollouts and lets the GIL-free rollout
+    kernel calls overlap.
 
-    return action
+    Args:
+        args:   A tuple of (board, current_state, bot_identity, root_actions, min_iters,
+                deadline, worker_seed). root_actions is the root's legal action list,
+                computed once by think and shipped with the args instead of being
+                recomputed per worker. deadline is an absolute time.monotonic()
+                timestamp shared by all workers; each worker runs at least min_iters
+                iterations, then keeps simulating in batches until the deadline.
 
-def is_win(board: Board, state, identity_of_bot: int):
-    # checks if state is a win state for identity_of_bot
-    outcome = board.points_values(state)
-    assert outcome is not None, "is_win was called on a non-terminal state"
-    return outcome[identity_of_bot] == 1
+    Returns:
+        A dictionary mapping each root action to its (wins, visits) pair.
 
-def think(board: Board, current_state):
+    """
+    board, current_state, bot_identity, root_actions, min_iters, deadline, worker_seed = args
+    # reseed so the workers' trees diverge; the kernel keeps its own RNG state
+    seed(worker_seed)
+    fast_rollout.seed(worker_seed)
+    root_node = MCTSNode(parent=None, parent_action=None, action_list=root_actions)
+
+    simsDone = 0
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        while simsDone < min_iters or monotonic() < deadline:
+            # collect a batch of expanded leaves, each left carrying its virtual losses
+            leaves = []
+            for _ in range(batch_size):
+                leafNode, newState = traverse_nodes(root_node, board, current_state, bot_identity)
+                newLeaf, newState = expand_leaf(leafNode, board, newState)
+                leaves.append((newLeaf, newState))
+
+            # roll the whole batch out concurrently
+            futures = [executor.submit(rollout, board, leafState) for _, leafState in leaves]
+
+            # backpropagate every result, lifting the virtual losses on the way up
+            for (newLeaf, _), future in zip(leaves, futures):
+                winValue = future.result()
+                backpropagate(newLeaf, winValue[bot_identity])
+
+            simsDone += batch_size
+
+    return {action: (child.wins, child.visits)
+            for action, child in zip(root_node.child_actions, root_node.children)}
+
+def think(board: Board, current_state, time_budget=1.0):
     """ Performs MCTS by sampling games and calling the appropriate functions to construct the game tree.
+    The search is root-parallelized: each worker process builds its own tree until a shared
+    wall-clock deadline, and the root statistics are summed before choosing an action.
 
     Args:
-        board:  The game setup.
-        state:  The state of the game.
+        board:        The game setup.
+        state:        The state of the game.
+        time_budget:  Wall-clock seconds to spend on the search. Budgeting by time
+                      instead of a fixed iteration count gives constant response
+                      latency whatever the branching factor; num_nodes still acts
+                      as a floor so an absurdly small budget cannot starve the tree.
 
     Returns:    The action to be taken.
 
     """
     bot_identity = board.current_player(current_state) # 1 or 2
-    root_node = MCTSNode(parent=None, parent_action=None, action_list=board.legal_actions(current_state))
 
-    for _ in range(num_nodes):
-        # Copy the game for sampling a playthrough
-        state = current_state
+    # the root's legal actions are the same for every worker, so compute them once here
+    root_actions = board.legal_actions(current_state)
+
+    # every worker polls the same absolute deadline and runs at least its share of num_nodes
+    deadline = monotonic() + time_budget
+    min_iters = num_nodes // num_workers
+    workerArgs = [(board, current_state, bot_identity, root_actions, min_iters, deadline, getrandbits(32))
+                  for _ in range(num_workers)]
+
+    with Pool(processes=num_workers) as pool:
+        results = pool.map(_build_tree, workerArgs)
+
+    # sum (wins, visits) per action across the workers' trees
+    totals = {}
+    for stats in results:
+        for action, (wins, visits) in stats.items():
+            prevWins, prevVisits = totals.get(action, (0, 0))
+            totals[action] = (prevWins + wins, prevVisits + visits)
+
+    # rebuild an aggregate root so the usual selection can run on the summed counts
+    root_node = MCTSNode(parent=None, parent_action=None, action_list=list(totals.keys()))
+    for i, (action, (wins, visits)) in enumerate(totals.items()):
+        child = MCTSNode(parent=root_node, parent_action=action, action_list=[])
+        child.wins = wins
+        child.visits = visits
+        child.index_in_parent = i
+        root_node.children.append(child)
+        root_node.child_actions.append(action)
+        root_node.child_wins[i] = wins
+        root_node.child_visits[i] = visits
 
-        # Start at root
-        node = root_node
-
-        # Do MCTS - This is all you!
-        leafNode, newState = traverse_nodes(node, board, state, bot_identity)
-
-        newLeaf, newState = expand_leaf(leafNode, board, newState)
-
-        newState = rollout(board, newState)
-
-        winValue = board.points_values(newState)
-
-        backpropagate(newLeaf, winValue[bot_identity])
-            
     # Return an action, typically the most frequently used action (from the root) or the action with the best
     # estimated win rate.
     best_action = get_best_action(root_node)
-    
+
     print(f"Action chosen: {best_action}")
     return best_action
@@ -1,3 +1,6 @@
+from threading import Lock
+
+import numpy as np
 
 
 class MCTSNode:
@@ -14,12 +17,32 @@ class MCTSNode:
         self.parent = parent                    # Parent node to this node
         self.parent_action = parent_action      # The move that got us to this node - "None" for the root node.
 
-        self.child_nodes = {}                   # Action -> MCTSNode dictionary of children
+        self.children = []                      # Expanded child nodes, parallel to child_actions
         self.untried_actions = action_list      # Yet unexplored actions
 
         self.wins = 0                           # Total wins of all paths through this node.
         self.visits = 0                         # Number of times this node has been visited.
 
+        self.virtual_losses = 0                 # In-flight simulations through this node (tree parallelization).
+        self.lock = Lock()                      # Guards count updates when threads share the tree.
+
+        # Structure-of-arrays mirror of the children's statistics, preallocated to the
+        # number of legal actions here. Keeping the columns contiguous lets selection
+        # compute every child's UCB in one vectorized expression instead of a Python loop,
+        # and indexing children by position avoids hashing 4-tuple action keys.
+        capacity = len(action_list)
+        self.child_actions = []                 # Action per expanded child, parallel to the arrays below
+        self.child_wins = np.zeros(capacity)
+        self.child_visits = np.zeros(capacity)
+        self.child_virtual_losses = np.zeros(capacity)
+
+        # Accumulators maintained during backpropagation so selection does not
+        # redo the same divide and sqrt on every pass through this node.
+        self.child_q = np.zeros(capacity)               # wins / visits per child
+        self.child_inv_sqrt_visits = np.zeros(capacity) # 1 / sqrt(visits) per child
+
+        self.index_in_parent = None             # This node's slot in its parent's arrays
+
     def __repr__(self):
         """
         This method provides a string representing the node. Any time str(node) is used, this method is called.
@@ -40,6 +63,6 @@ class MCTSNode:
         """
         string = ''.join(['| ' for i in range(indent)]) + str(self) + '\n'
         if horizon > 0:
-            for child in self.child_nodes.values():
+            for child in self.children:
                 string += child.tree_to_string(horizon - 1, indent + 1)
         return string
@@ -36,19 +36,24 @@ def traverse_nodes(node: MCTSNode, board: Board, state, bot_identity: int):
         bestNode = None
         bestAction = None
 
+        # Whose turn it is depends only on the state, not the child, so compute it once
+        isOpponent = bot_identity == board.current_player(state)
+
         # Iterate over all child nodes
-        for child in currentNode.child_nodes.keys():
-            # If the current node is not visited or has an untried action
-            if currentNode.child_nodes[child].visits == 0 or len(currentNode.untried_actions) > 0:
-                return currentNode.child_nodes[child], board.next_state(state, child)
+        for child, childNode in zip(currentNode.child_actions, currentNode.children):
+            # If the current node is not visited
+            # (the untried_actions check that used to sit here was dead code:
+            # the guard above already ensures there are no untried actions)
+            if childNode.visits == 0:
+                return childNode, board.next_state(state, child)
 
-            childUCB = ucb(currentNode.child_nodes[child], bot_identity == board.current_player(state))
+            childUCB = ucb(childNode, isOpponent)
 
             # Update the current best node and ucb
             if childUCB > bestUCB:
                 bestUCB = childUCB
                 bestAction = child
-                bestNode = currentNode.child_nodes[child]
+                bestNode = childNode
 
         # Set the current best node as the starting point for the next round of the loop
         currentNode = bestNode
@@ -86,9 +91,10 @@ def expand_leaf(node: MCTSNode, board: Board, state):
 
         # new node
         newNode = MCTSNode(node, parentAction, actionList)
-        node.child_nodes[parentAction] = newNode
+        node.children.append(newNode)
+        node.child_actions.append(parentAction)
+
 
-    
         return newNode, nextState
     
     return node, state
@@ -191,7 +197,7 @@ def get_best_action(root_node: MCTSNode):
     action = None
     bestRate = -999999
 
-    for child in root_node.child_nodes.values(): 
+    for child in root_node.children:
         currRate = child.wins / child.visits
 
         if currRate > bestRate:
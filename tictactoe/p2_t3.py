@@ -293,6 +293,18 @@ class Board(object):
         if state[18] | state[19] == 0x1ff:
             return {1: 0.5, 2: 0.5}
 
+    def owned_box(self, state, R, C):
+        # Single-box probe: two bit tests instead of building the full
+        # owned_boxes dictionary when only one entry is needed.
+        index = positions[(R, C)]
+        p1 = state[18] & ~state[19]
+        p2 = state[19] & ~state[18]
+        if p1 & index:
+            return 1
+        if p2 & index:
+            return 2
+        return 0
+
     def owned_boxes(self, state):
         p1 = state[18] & ~state[19]
         p2 = state[19] & ~state[18]
@@ -23,14 +23,22 @@ def think(board, state):
     me = board.current_player(state)
 
     # Define a helper function to calculate the difference between the bot's score and the opponent's.
-    def outcome(owned_boxes, game_points):
+    def outcome(rollout_state, game_points):
         if game_points is not None:
             # Try to normalize it up?  Not so sure about this code anyhow.
             red_score = game_points[1]*9
             blue_score = game_points[2]*9
         else:
-            red_score = len([v for v in owned_boxes.values() if v == 1])
-            blue_score = len([v for v in owned_boxes.values() if v == 2])
+            # Probe each box directly rather than building the owned_boxes dict.
+            red_score = 0
+            blue_score = 0
+            for R in range(3):
+                for C in range(3):
+                    owner = board.owned_box(rollout_state, R, C)
+                    if owner == 1:
+                        red_score += 1
+                    elif owner == 2:
+                        blue_score += 1
         return red_score - blue_score if me == 1 else blue_score - red_score
 
     for move in moves:
@@ -47,7 +55,7 @@ def think(board, state):
                 rollout_move = random.choice(board.legal_actions(rollout_state))
                 rollout_state = board.next_state(rollout_state, rollout_move)
 
-            total_score += outcome(board.owned_boxes(rollout_state),
+            total_score += outcome(rollout_state,
                                    board.points_values(rollout_state))
 
         expectation = float(total_score) / ROLLOUTS